@@ -1,44 +1,193 @@
+import logging
 import os
+import re
 import subprocess
-from typing import Optional
+from collections import deque
+from pathlib import Path
+from typing import Optional, Union
 
-def get_git_remote_url(repo_path: str, remote_name: str) -> Optional[str]:
+logger = logging.getLogger(__name__)
+
+_REMOTE_SECTION_RE = re.compile(r'^\s*\[\s*remote\s+"((?:[^"\\]|\\.)*)"\s*\]', re.IGNORECASE)
+_SECTION_RE = re.compile(r'^\s*\[')
+_URL_KEY_RE = re.compile(r'^\s*url\s*=', re.IGNORECASE)
+
+# Environment of all git commands: the full environment (git and ssh need platform and
+# setup specific variables such as SYSTEMROOT, GIT_CONFIG_GLOBAL or SSH_ASKPASS), but
+# never block a scripted run on a username/password prompt
+GIT_ENV = {**os.environ, "GIT_TERMINAL_PROMPT": "0"}
+
+# Protocol v2 lets the server send only the refs we ask for instead of advertising all of
+# them (git < 2.26 or a protocol.version=0/1 config would still use v0/v1). The skipping
+# negotiation algorithm needs fewer have/ack round trips for long histories.
+FETCH_CONFIG = ["-c", "protocol.version=2", "-c", "fetch.negotiationAlgorithm=skipping"]
+
+def run_git(args: list[str], cwd: Union[str, Path], capture: bool = True, env: Optional[dict[str, str]] = None) -> subprocess.CompletedProcess:
+    """Run a git command without stdin and without terminal prompts.
+    @param args: The git arguments (without the leading "git")
+    @param cwd: The directory to run git in
+    @param capture: Whether to capture stdout/stderr (as text) instead of passing them through
+    @param env: The environment to use instead of GIT_ENV
+    @return: The completed process
+    @raise subprocess.CalledProcessError: If git exits with a non-zero status
+    """
+    return subprocess.run(
+        ["git", *args],
+        cwd=cwd,
+        stdin=subprocess.DEVNULL,
+        capture_output=capture,
+        text=True,
+        check=True,
+        env=GIT_ENV if env is None else env
+    )
+
+def run_git_streamed(args: list[str], cwd: Union[str, Path], verbose: bool = False,
+                     env: Optional[dict[str, str]] = None, tail_lines: int = 20,
+                     output: Optional[list[str]] = None) -> None:
+    """Run a git command whose (possibly large) output is only of interest on failure.
+    The output is read line by line while git runs and only the last lines are kept,
+    so memory stays bounded and git never blocks on a full pipe. With verbose every
+    line is also logged as debug record, so it stays in order with the other output
+    of the project (also when backup-all collects it per project).
+    @param args: The git arguments (without the leading "git")
+    @param cwd: The directory to run git in
+    @param verbose: Log the output instead of discarding it
+    @param env: The environment to use instead of GIT_ENV
+    @param tail_lines: Number of trailing output lines to keep for the error
+    @param output: With verbose, collect the lines here instead of logging them (for threads
+                   whose log records would not end up in the output of the project)
+    @raise subprocess.CalledProcessError: If git exits with a non-zero status, its
+                                          output holds the last lines of git's output
+    """
+    with subprocess.Popen(
+        ["git", *args],
+        cwd=cwd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        env=GIT_ENV if env is None else env
+    ) as proc:
+        tail = deque(maxlen=tail_lines)
+        for line in proc.stdout:
+            tail.append(line)
+            if verbose:
+                if output is not None:
+                    output.append(line.rstrip("\n"))
+                else:
+                    logger.debug(line.rstrip("\n"))
+    
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, proc.args, output="".join(tail))
+
+def get_git_remote_url(repo_path: Union[str, Path], remote_name: str) -> Optional[str]:
     """Get URL for a specific git remote.
     @param repo_path: The path to the git repository
     @param remote_name: The name of the remote
     @return: The URL of the remote or None if not found
     """
     try:
-        result = subprocess.run(
-            ["git", "remote", "get-url", remote_name],
-            cwd=repo_path,
-            capture_output=True,
-            text=True,
-            check=True
-        )
+        result = run_git(["remote", "get-url", remote_name], repo_path)
         return result.stdout.strip()
     except subprocess.CalledProcessError:
         return None
 
-def get_all_git_remotes(repo_path: str) -> dict[str, str]:
-    """Get all git remotes with their URLs.
+def get_all_git_remotes(repo_path: Union[str, Path]) -> dict[str, str]:
+    """Get all git remotes with their configured URLs.
+    Uses a single `git config` call instead of querying every remote on its own.
+    Unlike `git remote -v` this returns the URLs as written in the config,
+    without any url.<base>.insteadOf rewriting applied.
     @param repo_path: The path to the git repository
     @return: A dictionary mapping remote names to their URLs
     """
     try:
-        result = subprocess.run(
-            ["git", "remote"],
-            cwd=repo_path,
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        remote_names = result.stdout.strip().split('\n')
+        result = run_git(["config", "--get-regexp", r"^remote\..*\.url$"], repo_path)
         
+        # Lines look like "remote.<name>.url <url>"
         remotes = {}
-        for name in remote_names:
-            if url := get_git_remote_url(repo_path, name):
-                remotes[name] = url
+        for line in result.stdout.splitlines():
+            key, _, url = line.partition(" ")
+            remotes.setdefault(key[len("remote."):-len(".url")], url)
         return remotes
     except subprocess.CalledProcessError:
         return {}
+
+def get_remote_default_branch(repo_path: Union[str, Path], remote_name: str = "origin") -> Optional[str]:
+    """Get the default branch of a remote via `git ls-remote --symref`.
+    @param repo_path: The path to the git repository
+    @param remote_name: The name of the remote
+    @return: The branch name or None if the remote does not advertise its HEAD
+    """
+    try:
+        result = run_git([*FETCH_CONFIG, "ls-remote", "--symref", remote_name, "HEAD"], repo_path)
+        # The symref line looks like "ref: refs/heads/<branch>\tHEAD"
+        for line in result.stdout.splitlines():
+            if line.startswith("ref: refs/heads/"):
+                return line[len("ref: refs/heads/"):].split("\t")[0]
+        return None
+    except subprocess.CalledProcessError:
+        return None
+
+def get_remote_branch_sha(repo_path: Union[str, Path], branch: str, remote_name: str = "origin") -> Optional[str]:
+    """Get the commit a branch of a remote points to via `git ls-remote`, without fetching.
+    @param repo_path: The path to the git repository
+    @param branch: The name of the branch
+    @param remote_name: The name of the remote
+    @return: The commit hash or None if the branch or remote is not available
+    """
+    try:
+        result = run_git([*FETCH_CONFIG, "ls-remote", remote_name, f"refs/heads/{branch}"], repo_path)
+        return result.stdout.split("\t", 1)[0].strip() or None
+    except subprocess.CalledProcessError:
+        return None
+
+def _quote_git_config_value(value: str) -> str:
+    """Quote a value for .git/config if it contains characters git treats specially."""
+    if value != value.strip() or any(c in value for c in '"\\#;'):
+        escaped = value.replace('\\', '\\\\').replace('"', '\\"')
+        return f'"{escaped}"'
+    return value
+
+def set_git_remotes(repo_path: Union[str, Path], remotes: dict[str, str]) -> None:
+    """Add or update several git remotes with a single rewrite of .git/config.
+    Existing remote sections only get their url replaced, new remotes get the
+    same url/fetch entries `git remote add` would create. The file is written
+    via .git/config.lock and a rename, the same locking protocol git uses.
+    @param repo_path: The path to the git repository
+    @param remotes: A dictionary mapping remote names to their new URLs
+    @raise OSError: If the config cannot be read, locked or written
+    """
+    config_path = os.path.join(repo_path, ".git", "config")
+    lock_path = config_path + ".lock"
+    
+    with open(config_path, "r", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    
+    pending = dict(remotes)
+    seen_sections = set()
+    output = []
+    current = None
+    for line in lines:
+        if match := _REMOTE_SECTION_RE.match(line):
+            current = re.sub(r'\\(.)', r'\1', match.group(1))
+            seen_sections.add(current)
+        elif _SECTION_RE.match(line):
+            current = None
+        elif current in pending and _URL_KEY_RE.match(line):
+            line = f"\turl = {_quote_git_config_value(pending.pop(current))}"
+        output.append(line)
+    
+    for name, url in pending.items():
+        output.append(f'[remote "{name}"]')
+        output.append(f"\turl = {_quote_git_config_value(url)}")
+        if name not in seen_sections:
+            output.append(f"\tfetch = +refs/heads/*:refs/remotes/{name}/*")
+    
+    fd = os.open(lock_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write("\n".join(output) + "\n")
+        os.replace(lock_path, config_path)
+    except BaseException:
+        os.unlink(lock_path)
+        raise
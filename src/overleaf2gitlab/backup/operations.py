@@ -1,142 +1,288 @@
-import os
+import json
+import logging
+import shutil
 import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from .git import get_all_git_remotes, get_git_remote_url
+from typing import Optional
+from .git import FETCH_CONFIG, GIT_ENV, get_all_git_remotes, get_git_remote_url, get_remote_branch_sha, get_remote_default_branch, run_git, run_git_streamed, set_git_remotes
 
-def mk_cache_overleaf_dir(overleaf_id: str, cache_dir: str) -> None:
+logger = logging.getLogger(__name__)
+
+# Small per-repository state, kept inside .git: the resolved default branch and the
+# origin commit that was last pushed successfully to all backups (last_origin_sha, synced_remotes)
+STATE_FILE_NAME = "overleaf2gitlab.json"
+DEFAULT_BRANCH = "master"
+# Share one SSH connection per host between pushes: the first push opens a master
+# connection that later pushes (also of other projects) reuse for 60 seconds
+SSH_MULTIPLEX_COMMAND = "ssh -o ControlMaster=auto -o ControlPath=~/.ssh/cm-%C -o ControlPersist=60s"
+
+OVERLEAF_GIT_URL = "https://git.overleaf.com/"
+
+def _expected_remotes(overleaf_id: str, gitlab_paths: list[str]) -> dict[str, str]:
+    """Get the remotes (origin + backup0..N) a cached repository should have."""
+    return {
+        "origin": f"{OVERLEAF_GIT_URL}{overleaf_id}",
+        **{f"backup{i}": f"ssh://{gitlab_path}" for i, gitlab_path in enumerate(gitlab_paths)},
+    }
+
+def _describe_git_error(e: subprocess.CalledProcessError, verbose: bool) -> str:
+    """Describe a failed git command together with git's reason (the last lines of its output).
+    With verbose the output was already shown and is left out.
+    """
+    output = "" if verbose else "".join(part for part in (e.output, e.stderr) if part).rstrip()
+    return f"{e}\n{output}" if output else str(e)
+
+def get_push_env(repo_path: Path) -> dict[str, str]:
+    """Environment for git push with SSH connection sharing, unless the user configured ssh for git
+    (GIT_SSH_COMMAND, GIT_SSH or core.sshCommand, which GIT_SSH_COMMAND would override).
+    """
+    env = dict(GIT_ENV)
+    if "GIT_SSH_COMMAND" in env or "GIT_SSH" in env:
+        return env
+    try:
+        run_git(["config", "--get", "core.sshCommand"], repo_path)
+        return env
+    except subprocess.CalledProcessError:
+        pass  # not set
+    env["GIT_SSH_COMMAND"] = SSH_MULTIPLEX_COMMAND
+    return env
+
+def get_cache_overleaf_repo_path(overleaf_id: str, cache_dir: str) -> Path:
+    """Get the path of the cached git repository for the Overleaf project."""
+    return Path(cache_dir) / f"overleaf_{overleaf_id}"
+
+def mk_cache_overleaf_dir(repo_path: Path) -> None:
     """Create the cache directory for the Overleaf project."""
-    os.makedirs(os.path.join(cache_dir, f"overleaf_{overleaf_id}"), exist_ok=True)
+    repo_path.mkdir(parents=True, exist_ok=True)
 
-def check_cache_overleaf_git_existence(overleaf_id: str, cache_dir: str) -> bool:
+def check_cache_overleaf_git_existence(repo_path: Path) -> bool:
     """Check if the Overleaf project directory exists and is a git repository."""
-    return os.path.exists(os.path.join(cache_dir, f"overleaf_{overleaf_id}", ".git"))
+    return repo_path.joinpath(".git").exists()
 
-def mk_cache_overleaf_git_dir(overleaf_id: str, cache_dir: str) -> None:
-    """Create and initialize git repository for the Overleaf project."""
-    if not check_cache_overleaf_git_existence(overleaf_id, cache_dir):
-        mk_cache_overleaf_dir(overleaf_id, cache_dir)
-        repo_path = os.path.join(cache_dir, f"overleaf_{overleaf_id}")
-        
-        subprocess.run(["git", "init"], cwd=repo_path, check=True)
+def mk_cache_overleaf_git_dir(repo_path: Path, clone_url: Optional[str] = None) -> None:
+    """Create and initialize git repository for the Overleaf project.
+    @param clone_url: If given, shallow-clone (--depth=1) this URL instead of creating an empty repository
+    """
+    if not check_cache_overleaf_git_existence(repo_path):
+        mk_cache_overleaf_dir(repo_path)
         
         credentials_dir = Path.home() / ".gitconfig.d"
         credentials_dir.mkdir(exist_ok=True)
         credentials_file = credentials_dir / "overleaf"
+        credential_helper = f"store --file={credentials_file}"
         
-        subprocess.run([
-            "git", "config", "--local", "credential.helper", 
-            f"store --file={credentials_file}"
-        ], cwd=repo_path, check=True)
-
-def setup_git_remotes(overleaf_id: str, gitlab_paths: list[str], cache_dir: str) -> bool:
-    """Setup/update git remotes to match expected configuration."""
-    repo_path = os.path.join(cache_dir, f"overleaf_{overleaf_id}")
-    
-    if not check_cache_overleaf_git_existence(overleaf_id, cache_dir):
-        print(f"Creating git repository in {repo_path}")
-        mk_cache_overleaf_git_dir(overleaf_id, cache_dir)
+        if clone_url:
+            # -c stores the helper in the new repository before anything is fetched. git runs
+            # inside the (empty) repository directory, so it clones into "." - repo_path itself
+            # could be relative and would then be resolved a second time
+            run_git([
+                *FETCH_CONFIG, "clone", "--depth=1", "--no-single-branch",
+                "-c", f"credential.helper={credential_helper}", clone_url, "."
+            ], repo_path)
+            return
+        
+        run_git(["init"], repo_path)
+        run_git(["config", "--local", "credential.helper", credential_helper], repo_path)
+
+def check_cache_overleaf_git_config_valid(repo_path: Path, overleaf_id: str, gitlab_paths: list[str],
+                                          current_remotes: Optional[dict[str, str]] = None) -> bool:
+    """Check if the cached repository already has the expected origin and backup remotes.
+    Mismatches are not reported, they are fixed right away by setup_git_remotes.
+    @param current_remotes: Already known remotes of the repository, read from git if not given
+    """
+    if current_remotes is None:
+        current_remotes = get_all_git_remotes(repo_path)
     
+    return all(current_remotes.get(name) == url
+               for name, url in _expected_remotes(overleaf_id, gitlab_paths).items())
+
+def setup_git_remotes(repo_path: Path, overleaf_id: str, gitlab_paths: list[str],
+                      current_remotes: Optional[dict[str, str]] = None, shallow: bool = False) -> bool:
+    """Setup/update git remotes to match expected configuration.
+    @param current_remotes: Already known remotes of the repository, read from git if not
+                            given. The dictionary is updated in place with the new remotes.
+    @param shallow: Create a missing repository as shallow clone of the Overleaf project
+    """
     try:
-        origin_url = f"https://git.overleaf.com/{overleaf_id}"
-        current_remotes = get_all_git_remotes(repo_path)
+        if not check_cache_overleaf_git_existence(repo_path):
+            logger.info(f"Creating git repository in {repo_path}")
+            mk_cache_overleaf_git_dir(repo_path, f"{OVERLEAF_GIT_URL}{overleaf_id}" if shallow else None)
+            if shallow and current_remotes is not None:
+                current_remotes.update(get_all_git_remotes(repo_path))
         
-        # Set/update origin remote
-        if "origin" in current_remotes:
-            if current_remotes["origin"] != origin_url:
-                subprocess.run(["git", "remote", "set-url", "origin", origin_url], 
-                             cwd=repo_path, check=True)
-        else:
-            subprocess.run(["git", "remote", "add", "origin", origin_url], 
-                         cwd=repo_path, check=True)
+        if current_remotes is None:
+            current_remotes = get_all_git_remotes(repo_path)
         
-        # Setup backup remotes
-        for i, gitlab_path in enumerate(gitlab_paths):
-            backup_name = f"backup{i}"
-            backup_url = f"ssh://{gitlab_path}"
-            
-            if backup_name in current_remotes:
-                if current_remotes[backup_name] != backup_url:
-                    subprocess.run(["git", "remote", "set-url", backup_name, backup_url], 
-                                 cwd=repo_path, check=True)
-            else:
-                subprocess.run(["git", "remote", "add", backup_name, backup_url], 
-                             cwd=repo_path, check=True)
+        # Collect added/changed remotes and write them with a single config update
+        changed_remotes = {
+            name: url for name, url in _expected_remotes(overleaf_id, gitlab_paths).items()
+            if current_remotes.get(name) != url
+        }
+        if changed_remotes:
+            set_git_remotes(repo_path, changed_remotes)
+            current_remotes.update(changed_remotes)
         
         return True
         
-    except subprocess.CalledProcessError as e:
-        print(f"Error setting up git remotes: {e}")
+    except (subprocess.CalledProcessError, OSError) as e:
+        logger.error(f"Error setting up git remotes: {e}")
         return False
 
-def sync_repositories(overleaf_id: str, cache_dir: str, verbose: bool = False) -> bool:
-    """Sync repositories: pull from overleaf -> push to backups."""
-    repo_path = os.path.join(cache_dir, f"overleaf_{overleaf_id}")
+def load_repo_state(repo_path: Path) -> dict:
+    """Load the cached state of a repository, empty if missing or unreadable."""
+    try:
+        with open(repo_path / ".git" / STATE_FILE_NAME, "r") as f:
+            state = json.load(f)
+        return state if isinstance(state, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+def save_repo_state(repo_path: Path, state: dict) -> None:
+    """Store the cached state of a repository (best effort)."""
+    try:
+        with open(repo_path / ".git" / STATE_FILE_NAME, "w") as f:
+            json.dump(state, f)
+    except OSError as e:
+        logger.warning(f"Warning: Failed to save repository state: {e}")
+
+def resolve_default_branch(repo_path: Path) -> str:
+    """Get the default branch of origin, cached in the repository state."""
+    state = load_repo_state(repo_path)
+    if branch := state.get("default_branch"):
+        return branch
     
-    if not check_cache_overleaf_git_existence(overleaf_id, cache_dir):
-        print(f"Error: Git repository not found in {repo_path}")
+    branch = get_remote_default_branch(repo_path) or DEFAULT_BRANCH
+    logger.debug(f"Default branch of origin: {branch}")
+    state["default_branch"] = branch
+    save_repo_state(repo_path, state)
+    return branch
+
+def push_to_remote(repo_path: Path, remote: str, branch: str, verbose: bool = False,
+                   env: Optional[dict[str, str]] = None) -> tuple[bool, str]:
+    """Push the current branch (and all tags) to the given branch of a backup remote.
+    The result message (with verbose preceded by the output of git) is returned instead
+    of printed, so concurrent pushes do not interleave.
+    @param env: The push environment from get_push_env, determined here if not given
+    @return: (success, message)
+    """
+    output = []
+    try:
+        run_git_streamed(["push", "--tags", remote, f"HEAD:refs/heads/{branch}"], repo_path,
+                         verbose, env=env or get_push_env(repo_path), output=output)
+        return True, "\n".join([*output, f"✓ Successfully pushed to {remote}"])
+        
+    except subprocess.CalledProcessError as e:
+        return False, "\n".join([*output, f"✗ Failed to push to {remote}: {_describe_git_error(e, verbose)}"])
+
+def sync_repositories(repo_path: Path, overleaf_id: str, verbose: bool = False,
+                      current_remotes: Optional[dict[str, str]] = None) -> bool:
+    """Sync repositories: pull from overleaf -> push to backups (in parallel).
+    Skipped entirely if origin is still at the commit that was last pushed to all backups.
+    @param current_remotes: Already known remotes of the repository, read from git if not given
+    """
+    if not check_cache_overleaf_git_existence(repo_path):
+        logger.error(f"Error: Git repository not found in {repo_path}")
         return False
     
+    branch = resolve_default_branch(repo_path)
+    if current_remotes is None:
+        current_remotes = get_all_git_remotes(repo_path)
+    backup_remotes = sorted(name for name in current_remotes.keys() if name.startswith('backup'))
+    backup_urls = [current_remotes[name] for name in backup_remotes]
+    
+    # 0. Nothing to do if neither origin nor the backup remotes changed since the last sync
+    state = load_repo_state(repo_path)
+    origin_sha = get_remote_branch_sha(repo_path, branch)
+    if (origin_sha and state.get("last_origin_sha") == origin_sha
+            and state.get("synced_remotes") == backup_urls):
+        logger.info(f"✓ origin/{branch} unchanged ({origin_sha[:8]}), nothing to sync")
+        return True
+    
+    # 1. Fetch the default branch and tags from Overleaf and fast-forward to it
     try:
-        # 1. Pull from Overleaf (master branch)
-        if verbose:
-            print(f"Pulling from Overleaf for project {overleaf_id}...")
-        
-        subprocess.run([
-            "git", "pull", "origin", "master"
-        ], cwd=repo_path, check=True, capture_output=not verbose)
-        print(f"✓ Successfully pulled from origin/master")
+        logger.debug(f"Pulling from Overleaf for project {overleaf_id}...")
         
-        # 2. Push to backup remotes (master branch)
-        current_remotes = get_all_git_remotes(repo_path)
-        backup_remotes = [name for name in current_remotes.keys() if name.startswith('backup')]
+        run_git_streamed([*FETCH_CONFIG, "fetch", "origin", branch, "--tags", "--prune"], repo_path, verbose)
+    except subprocess.CalledProcessError as e:
+        # The cached branch may be outdated, resolve it again on the next run
+        state = load_repo_state(repo_path)
+        if state.pop("default_branch", None):
+            save_repo_state(repo_path, state)
+        logger.error(f"Error during sync: {_describe_git_error(e, verbose)}")
+        return False
+    
+    try:
+        run_git_streamed(["merge", "--ff-only", f"origin/{branch}"], repo_path, verbose)
+        logger.info(f"✓ Successfully pulled from origin/{branch}")
         
+        # 2. Push to backup remotes
         if not backup_remotes:
-            print("Warning: No backup remotes found")
+            logger.warning("Warning: No backup remotes found")
             return True
         
-        for remote in sorted(backup_remotes):
-            if verbose:
-                print(f"Pushing to {remote} ({current_remotes[remote]})...")
+        all_pushed = True
+        push_env = get_push_env(repo_path)
+        with ThreadPoolExecutor(max_workers=len(backup_remotes)) as executor:
+            futures = []
+            for remote in backup_remotes:
+                logger.debug(f"Pushing to {remote} ({current_remotes[remote]})...")
+                futures.append(executor.submit(push_to_remote, repo_path, remote, branch, verbose, push_env))
             
-            try:
-                subprocess.run([
-                    "git", "push", remote, "master"
-                ], cwd=repo_path, check=True, capture_output=not verbose)
-                print(f"✓ Successfully pushed to {remote}")
-                
-            except subprocess.CalledProcessError as e:
-                print(f"✗ Failed to push to {remote}: {e}")
-                continue
+            for future in as_completed(futures):
+                pushed, message = future.result()
+                all_pushed = all_pushed and pushed
+                (logger.info if pushed else logger.error)(message)
+        
+        # 3. Remember the synced commit, so unchanged projects are skipped next time
+        if all_pushed:
+            state = load_repo_state(repo_path)
+            state["last_origin_sha"] = run_git(["rev-parse", "HEAD"], repo_path).stdout.strip()
+            state["synced_remotes"] = backup_urls
+            save_repo_state(repo_path, state)
         
         return True
         
     except subprocess.CalledProcessError as e:
-        print(f"Error during sync: {e}")
+        logger.error(f"Error during sync: {_describe_git_error(e, verbose)}")
         return False
 
-def backup_overleaf_project(overleaf_id: str, gitlab_paths: list[str], cache_dir: str, clean: bool, verbose: bool = False) -> bool:
-    """Complete backup workflow for a single Overleaf project."""
-    print(f"\n{'='*60}")
-    print(f"Starting backup for Overleaf project: {overleaf_id}")
-    print(f"GitLab paths: {gitlab_paths}")
-    print(f"{'='*60}")
+def backup_overleaf_project(overleaf_id: str, gitlab_paths: list[str], cache_dir: str, clean: bool, verbose: bool = False,
+                            shallow: bool = False) -> bool:
+    """Complete backup workflow for a single Overleaf project.
+    With shallow, a new cache repository starts as shallow clone of the latest Overleaf commit.
+    """
+    logger.info(f"\n{'='*60}")
+    logger.info(f"Starting backup for Overleaf project: {overleaf_id}")
+    logger.info(f"GitLab paths: {gitlab_paths}")
+    logger.info(f"{'='*60}")
     
-    if not setup_git_remotes(overleaf_id, gitlab_paths, cache_dir):
-        print(f"✗ Failed to setup git remotes for {overleaf_id}")
-        return False
+    repo_path = get_cache_overleaf_repo_path(overleaf_id, cache_dir)
+    
+    # Read the remotes once and share them between validation, setup and sync
+    current_remotes = {}
+    repo_exists = check_cache_overleaf_git_existence(repo_path)
+    if repo_exists:
+        current_remotes = get_all_git_remotes(repo_path)
+    
+    # Only touch the remotes if the cached repository does not match the config
+    if not (repo_exists and check_cache_overleaf_git_config_valid(repo_path, overleaf_id, gitlab_paths,
+                                                                  current_remotes=current_remotes)):
+        if not setup_git_remotes(repo_path, overleaf_id, gitlab_paths, current_remotes, shallow):
+            logger.error(f"✗ Failed to setup git remotes for {overleaf_id}")
+            return False
     
-    if not sync_repositories(overleaf_id, cache_dir, verbose):
-        print(f"✗ Failed to sync repositories for {overleaf_id}")
+    if not sync_repositories(repo_path, overleaf_id, verbose, current_remotes):
+        logger.error(f"✗ Failed to sync repositories for {overleaf_id}")
         return False
     
-    print(f"✓ Backup completed successfully for {overleaf_id}")
+    logger.info(f"✓ Backup completed successfully for {overleaf_id}")
     
     if clean:
-        cache_path = os.path.join(cache_dir, f"overleaf_{overleaf_id}")
         try:
-            subprocess.run(["rm", "-rf", cache_path], check=True)
-            print(f"✓ Cleaned up cache directory: {cache_path}")
-        except subprocess.CalledProcessError as e:
-            print(f"Warning: Failed to clean cache: {e}")
+            shutil.rmtree(repo_path)
+            logger.info(f"✓ Cleaned up cache directory: {repo_path}")
+        except OSError as e:
+            logger.warning(f"Warning: Failed to clean cache: {e}")
     
     return True
@@ -1,12 +1,115 @@
-import configparser
 import os
-from typing import Tuple
-from .operations import read_config, get_overleaf_projects, write_config
+import sys
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from .operations import get_overleaf_projects, flush_projects
+from .validation import is_valid_overleaf_id
 
-def get_user_choice(prompt: str, valid_choices: list[str], allow_empty: bool = False) -> str:
-    """Get validated user input."""
+# Accepted answers of yes/no questions
+_YES_CHOICES = frozenset({'j', 'ja', 'y', 'yes'})
+_YES_NO_CHOICES = _YES_CHOICES | {'n', 'no', 'nein'}
+
+# Input history of the interactive setup, kept across sessions
+HISTORY_FILE = "~/.cache/overleaf2gitlab/history"
+_HISTORY_LENGTH = 500
+
+_readline = None
+_readline_loaded = False
+
+def _load_readline():
+    """Import readline once, input() uses it for line editing and history once imported.
+    @return: The readline module, None if stdin is no terminal or readline is not available (Windows)
+    """
+    global _readline, _readline_loaded
+    if not _readline_loaded:
+        _readline_loaded = True
+        if sys.stdin.isatty():
+            try:
+                import readline
+                _readline = readline
+            except ImportError:
+                pass
+    return _readline
+
+def _ask(prompt: str) -> str:
+    """Prompt for one line of input.
+    On a terminal, input() is used with readline for line editing and history (up arrow
+    repeats earlier GitLab paths), piped input is read from stdin directly (also with
+    Windows line endings).
+    @raise EOFError: If the input ended
+    """
+    if sys.stdin.isatty():
+        _load_readline()
+        return input(prompt)
+    
+    sys.stdout.write(prompt)
+    sys.stdout.flush()
+    line = sys.stdin.readline()
+    if not line:
+        raise EOFError("EOF when reading a line")
+    return line.rstrip('\r\n')
+
+def _start_line_editing(projects: Dict[str, List[str]]) -> Optional[str]:
+    """Load the input history and complete Overleaf IDs and GitLab paths with tab.
+    The completion always offers the current mappings, also after they were edited.
+    @return: Path of the history file to save at the end of the session, None without readline
+    """
+    readline = _load_readline()
+    if readline is None:
+        return None
+    
+    matches: List[str] = []
+    def complete(text: str, state: int) -> Optional[str]:
+        if state == 0:
+            candidates = {*projects, *(path for paths in projects.values() for path in paths)}
+            matches[:] = sorted(c for c in candidates if c.startswith(text))
+        return matches[state] if state < len(matches) else None
+    
+    readline.set_completer(complete)
+    # GitLab paths contain '/' and '-', only whitespace and commas separate entries
+    readline.set_completer_delims(" \t\n,")
+    if "libedit" in (readline.__doc__ or ""):  # macOS
+        readline.parse_and_bind("bind ^I rl_complete")
+    else:
+        readline.parse_and_bind("tab: complete")
+    
+    history_file = os.path.expanduser(HISTORY_FILE)
+    try:
+        readline.read_history_file(history_file)
+    except OSError:
+        pass  # first session
+    readline.set_history_length(_HISTORY_LENGTH)
+    return history_file
+
+def _save_history(history_file: Optional[str]) -> None:
+    """Write the input history of the session (best effort)."""
+    if history_file is None:
+        return
+    try:
+        os.makedirs(os.path.dirname(history_file), exist_ok=True)
+        _readline.write_history_file(history_file)
+    except OSError:
+        pass
+
+def _render(*lines: str) -> None:
+    """Write a block of lines with a single write instead of one print per line."""
+    sys.stdout.write("".join(line + "\n" for line in lines))
+
+def _prompt(*lines: str, tail: str) -> str:
+    """Show the given lines together with the prompt and read one line of input.
+    The text is written with a single write instead of one print per line.
+    @param tail: The prompt in the last line
+    """
+    return _ask("".join(line + "\n" for line in lines) + tail)
+
+def get_user_choice(prompt: str, valid_choices: Iterable[str], allow_empty: bool = False) -> str:
+    """Get validated user input.
+    @param valid_choices: Accepted answers (lowercase), ideally a frozenset such as _YES_NO_CHOICES
+    """
+    if not isinstance(valid_choices, (set, frozenset)):
+        valid_choices = frozenset(c.lower() for c in valid_choices)
+    
     while True:
-        choice = input(prompt).strip().lower()
+        choice = _ask(prompt).strip().lower()
         
         if not choice:
             if allow_empty:
@@ -20,161 +123,178 @@ def get_user_choice(prompt: str, valid_choices: list[str], allow_empty: bool = F
             
         return choice
 
-def list_existing_mappings(config: configparser.ConfigParser) -> None:
+def list_existing_mappings(projects: Dict[str, List[str]]) -> None:
     """Display all project mappings."""
-    projects = get_overleaf_projects(config, verbose=False)
-    
     if not projects:
         print("\n✗ Keine Projekt-Mappings gefunden")
         return
     
-    print("\n=== Bestehende Projekt-Mappings ===")
+    # Build the whole listing first and write it at once
+    lines = ["\n=== Bestehende Projekt-Mappings ==="]
     for i, (overleaf_id, gitlab_paths) in enumerate(projects.items(), 1):
-        print(f"{i}. Overleaf-ID: {overleaf_id}")
-        print("   GitLab-Pfade:")
-        for j, path in enumerate(gitlab_paths.split(','), 1):
-            print(f"      {j}. {path.strip()}")
-        print()
-
-def add_single_mapping(config_path: str, verbose: bool) -> Tuple[bool, str, str]:
-    """Add new project mapping interactively."""
-    print("\n=== Neues Projekt-Mapping hinzufügen ===")
-    
-    # Get Overleaf ID
-    print("\nSchritt 1: Overleaf-Projekt-ID")
-    print("Tipp: Finden Sie die ID in der URL Ihres Overleaf-Projekts")
-    print("Beispiel: https://www.overleaf.com/project/662a5ab30650c57e5355029b")
-    print("         Die ID wäre: 662a5ab30650c57e5355029b")
-    
-    overleaf_id = input("\nOverleaf-Projekt-ID: ").strip()
-    if not overleaf_id or overleaf_id.lower() == 'exit':
-        return False, "", ""
-    
-    # Get GitLab paths
-    print(f"\nSchritt 2: GitLab-Repository-Pfade für '{overleaf_id}'")
-    print("Format: ssh-alias/namespace/repository.git")
-    print("Beispiel: gitlab-urz/MackPhilip/mein-projekt.git")
-    
-    gitlab_paths = []
+        lines.append(f"{i}. Overleaf-ID: {overleaf_id}")
+        lines.append("   GitLab-Pfade:")
+        lines.extend(f"      {j}. {path}" for j, path in enumerate(gitlab_paths, 1))
+        lines.append("")
+    _render(*lines)
+
+def add_single_mapping(config_path: str, verbose: bool) -> Tuple[bool, str, List[str]]:
+    """Add new project mapping interactively.
+    @return: (success, overleaf_id, gitlab_paths)
+    """
+    # Get Overleaf ID, asked again until it has the right format
+    header = ("\n=== Neues Projekt-Mapping hinzufügen ===",
+              "\nSchritt 1: Overleaf-Projekt-ID",
+              "Tipp: Finden Sie die ID in der URL Ihres Overleaf-Projekts",
+              "Beispiel: https://www.overleaf.com/project/662a5ab30650c57e5355029b",
+              "         Die ID wäre: 662a5ab30650c57e5355029b")
+    while True:
+        overleaf_id = _prompt(*header, tail="\nOverleaf-Projekt-ID (oder 'exit'): ").strip()
+        header = ()
+        if not overleaf_id or overleaf_id.lower() == 'exit':
+            return False, "", []
+        if is_valid_overleaf_id(overleaf_id):
+            break
+        print(f"✗ Ungültige Overleaf-ID: {overleaf_id} (24 Hex-Zeichen erwartet)")
+    
+    # Get GitLab paths, the instructions are shown together with the first prompt
+    header = (f"\nSchritt 2: GitLab-Repository-Pfade für '{overleaf_id}'",
+              "Format: ssh-alias/namespace/repository.git",
+              "Beispiel: gitlab-urz/MackPhilip/mein-projekt.git")
+    
+    # Insertion-ordered set, so a path entered twice is only pushed to once
+    gitlab_paths: Dict[str, None] = {}
     while True:
-        path = input("\nGitLab-Pfad (oder 'done'/'exit'): ").strip()
+        path = _prompt(*header, tail="\nGitLab-Pfad (oder 'done'/'exit'): ").strip()
+        header = ()
+        command = path.lower()
         
-        if not path or path.lower() == 'exit':
-            return False, "", ""
+        if not path or command == 'exit':
+            return False, "", []
             
-        if path.lower() == 'done':
+        if command == 'done':
             if not gitlab_paths:
                 print("✗ Sie müssen mindestens einen GitLab-Pfad angeben")
                 continue
             break
             
-        gitlab_paths.append(path)
+        if path in gitlab_paths:
+            print(f"✗ Pfad bereits vorhanden: {path}")
+            continue
+        gitlab_paths[path] = None
         print(f"✓ Pfad hinzugefügt: {path}")
     
     # Confirm
-    gitlab_paths_str = ", ".join(gitlab_paths)
-    print(f"\n=== Bestätigung ===")
-    print(f"Overleaf-ID: {overleaf_id}")
-    print(f"GitLab-Pfade: {gitlab_paths_str}")
+    _render("\n=== Bestätigung ===",
+            f"Overleaf-ID: {overleaf_id}",
+            f"GitLab-Pfade: {', '.join(gitlab_paths)}")
     
-    choice = get_user_choice("\nMapping speichern? (j/n): ", 
-                           ['j', 'ja', 'y', 'yes', 'n', 'no', 'nein'])
+    choice = get_user_choice("\nMapping speichern? (j/n): ", _YES_NO_CHOICES)
     
-    if choice in ['j', 'ja', 'y', 'yes']:
-        return True, overleaf_id, gitlab_paths_str
+    if choice in _YES_CHOICES:
+        return True, overleaf_id, list(gitlab_paths)
     
-    return False, "", ""
+    return False, "", []
+
+def _menu_add_path(projects: Dict[str, List[str]], overleaf_id: str, gitlab_paths: List[str]) -> bool:
+    """Edit menu action: add a GitLab path."""
+    new_path = _ask("\nNeuer GitLab-Pfad: ").strip()
+    if new_path:
+        gitlab_paths.append(new_path)
+        projects[overleaf_id] = list(gitlab_paths)
+        print(f"\n✓ Pfad '{new_path}' wurde hinzugefügt")
+    return False
 
-def edit_gitlab_paths(config: configparser.ConfigParser, config_path: str, 
-                     overleaf_id: str, verbose: bool) -> bool:
-    """Edit GitLab paths for a project."""
+def _menu_remove_path(projects: Dict[str, List[str]], overleaf_id: str, gitlab_paths: List[str]) -> bool:
+    """Edit menu action: remove a GitLab path, or the whole project with its last path.
+    @return: True if the project was deleted
+    """
+    if not gitlab_paths:
+        print("\n✗ Keine GitLab-Pfade vorhanden")
+        return False
+        
+    lines = ["\n--- GitLab-Pfad entfernen ---"]
+    lines.extend(f"   {i}. {path}" for i, path in enumerate(gitlab_paths, 1))
+    lines.append(f"   {len(gitlab_paths) + 1}. Abbrechen")
+    
     try:
-        if 'repos' not in config or overleaf_id not in config['repos']:
+        idx = int(_prompt(*lines, tail=f"\nPfad auswählen (1-{len(gitlab_paths) + 1}): "))
+        if idx < 1 or idx > len(gitlab_paths) + 1:
+            raise ValueError()
+    except ValueError:
+        print("✗ Ungültige Eingabe")
+        return False
+    
+    if idx == len(gitlab_paths) + 1:  # Cancel
+        return False
+    
+    removed = gitlab_paths.pop(idx - 1)
+    
+    if not gitlab_paths:
+        confirm = _ask("\nHinweis: Keine GitLab-Pfade mehr vorhanden.\n" +
+                     f"Möchten Sie die Overleaf-ID {overleaf_id} komplett löschen? (j/n): ")
+        if confirm.strip().lower() in _YES_CHOICES:
+            del projects[overleaf_id]
+            print(f"\n✓ Overleaf-Projekt {overleaf_id} wurde gelöscht")
+            return True
+        gitlab_paths.insert(idx - 1, removed)
+        print("\n✗ Löschvorgang abgebrochen")
+        return False
+    
+    projects[overleaf_id] = list(gitlab_paths)
+    print(f"\n✓ Pfad '{removed}' wurde entfernt")
+    return False
+
+def _menu_reset_paths(projects: Dict[str, List[str]], overleaf_id: str, gitlab_paths: List[str]) -> bool:
+    """Edit menu action: replace all GitLab paths."""
+    new_paths = [p for p in (p.strip() for p in _ask("\nNeue GitLab-Pfade (kommagetrennt): ").split(',')) if p]
+    if new_paths:
+        gitlab_paths[:] = new_paths
+        projects[overleaf_id] = list(gitlab_paths)
+        print("\n✓ GitLab-Pfade wurden aktualisiert")
+    return False
+
+def _menu_done(projects: Dict[str, List[str]], overleaf_id: str, gitlab_paths: List[str]) -> bool:
+    """Edit menu action: leave the edit menu."""
+    return True
+
+# Actions of the edit menu by the entered choice, each returns True to leave the menu
+_EDIT_MENU_ACTIONS: Dict[str, Callable[[Dict[str, List[str]], str, List[str]], bool]] = {
+    '1': _menu_add_path,
+    '2': _menu_remove_path,
+    '3': _menu_reset_paths,
+    '4': _menu_done,  # Done
+    '5': _menu_done,  # Back
+}
+
+def edit_gitlab_paths(projects: Dict[str, List[str]], overleaf_id: str, verbose: bool) -> bool:
+    """Edit GitLab paths for a project.
+    The project mappings are only changed in place, interactive_config_setup writes them.
+    """
+    try:
+        if overleaf_id not in projects:
             print(f"✗ Overleaf-Projekt {overleaf_id} nicht in Konfiguration gefunden")
             return False
 
+        # Work on a copy, the mappings get a new list on every completed change
+        gitlab_paths = list(projects[overleaf_id])
+        
         while True:
-            # Get current paths
-            gitlab_paths = config['repos'][overleaf_id].split(',')
-            gitlab_paths = [p.strip() for p in gitlab_paths]
+            lines = ["\n=== GitLab-Pfade bearbeiten ===", f"Overleaf-ID: {overleaf_id}", "Aktuelle GitLab-Pfade:"]
+            lines.extend(f"   {i}. {path}" for i, path in enumerate(gitlab_paths, 1))
+            lines += ["\nOptionen:",
+                      "1. GitLab-Pfad hinzufügen",
+                      "2. GitLab-Pfad entfernen",
+                      "3. Alle GitLab-Pfade neu setzen",
+                      "4. Fertig",
+                      "5. Zurück"]
             
-            print("\n=== GitLab-Pfade bearbeiten ===")
-            print(f"Overleaf-ID: {overleaf_id}")
-            print("Aktuelle GitLab-Pfade:")
-            for i, path in enumerate(gitlab_paths, 1):
-                print(f"   {i}. {path}")
-            
-            print("\nOptionen:")
-            print("1. GitLab-Pfad hinzufügen")
-            print("2. GitLab-Pfad entfernen")
-            print("3. Alle GitLab-Pfade neu setzen")
-            print("4. Fertig")
-            print("5. Zurück")
-            
-            try:
-                choice = int(input("\nAktion auswählen (1-5): "))
-                if choice < 1 or choice > 5:
-                    raise ValueError()
-            except ValueError:
+            action = _EDIT_MENU_ACTIONS.get(_prompt(*lines, tail="\nAktion auswählen (1-5): ").strip())
+            if action is None:
                 print("✗ Ungültige Eingabe")
                 continue
             
-            if choice == 1:  # Add
-                new_path = input("\nNeuer GitLab-Pfad: ").strip()
-                if new_path:
-                    gitlab_paths.append(new_path)
-                    config['repos'][overleaf_id] = ', '.join(gitlab_paths)
-                    write_config(config, config_path)
-                    print(f"\n✓ Pfad '{new_path}' wurde hinzugefügt")
-            
-            elif choice == 2:  # Remove
-                if not gitlab_paths:
-                    print("\n✗ Keine GitLab-Pfade vorhanden")
-                    continue
-                    
-                print("\n--- GitLab-Pfad entfernen ---")
-                for i, path in enumerate(gitlab_paths, 1):
-                    print(f"   {i}. {path}")
-                print(f"   {len(gitlab_paths) + 1}. Abbrechen")
-                
-                try:
-                    idx = int(input(f"\nPfad auswählen (1-{len(gitlab_paths) + 1}): "))
-                    if idx < 1 or idx > len(gitlab_paths) + 1:
-                        raise ValueError()
-                    
-                    if idx == len(gitlab_paths) + 1:  # Cancel
-                        continue
-                    
-                    removed = gitlab_paths.pop(idx - 1)
-                    
-                    if not gitlab_paths:
-                        confirm = input("\nHinweis: Keine GitLab-Pfade mehr vorhanden.\n" +
-                                     f"Möchten Sie die Overleaf-ID {overleaf_id} komplett löschen? (j/n): ")
-                        if confirm.lower() == 'j':
-                            del config['repos'][overleaf_id]
-                            write_config(config, config_path)
-                            print(f"\n✓ Overleaf-Projekt {overleaf_id} wurde gelöscht")
-                            return True
-                        gitlab_paths.append(removed)
-                        print("\n✗ Löschvorgang abgebrochen")
-                        continue
-                    
-                    config['repos'][overleaf_id] = ', '.join(gitlab_paths)
-                    write_config(config, config_path)
-                    print(f"\n✓ Pfad '{removed}' wurde entfernt")
-                    
-                except ValueError:
-                    print("✗ Ungültige Eingabe")
-                    continue
-            
-            elif choice == 3:  # Reset all
-                new_paths = input("\nNeue GitLab-Pfade (kommagetrennt): ").strip()
-                if new_paths:
-                    config['repos'][overleaf_id] = new_paths
-                    write_config(config, config_path)
-                    print("\n✓ GitLab-Pfade wurden aktualisiert")
-            
-            elif choice in (4, 5):  # Done or Back
+            if action(projects, overleaf_id, gitlab_paths):
                 return True
                 
     except Exception as e:
@@ -182,45 +302,44 @@ def edit_gitlab_paths(config: configparser.ConfigParser, config_path: str,
         return False
 
 def interactive_config_setup(config_path: str, verbose: bool) -> bool:
-    """Interactive configuration management."""
+    """Interactive configuration management.
+    The project mappings are read once and edited in memory. All changes of the session
+    are written with a single write when it ends, also when it is aborted.
+    """
     print("\n=== Interaktive Konfigurationsverwaltung ===")
     
+    projects = get_overleaf_projects(config_path, verbose)
+    saved = dict(projects)
+    history_file = _start_line_editing(projects)
+    success = False
     try:
         while True:
-            print("\nOptionen:")
-            print("1. Neues Projekt-Mapping hinzufügen")
-            print("2. Bestehende Mappings bearbeiten")
-            print("3. Beenden")
-            
-            try:
-                choice = int(input("\nAktion auswählen (1-3): "))
-                if choice < 1 or choice > 3:
-                    raise ValueError()
-            except ValueError:
-                print("✗ Ungültige Eingabe")
-                continue
-            
-            config = read_config(config_path, verbose)
+            choice = _prompt("\nOptionen:",
+                             "1. Neues Projekt-Mapping hinzufügen",
+                             "2. Bestehende Mappings bearbeiten",
+                             "3. Beenden",
+                             tail="\nAktion auswählen (1-3): ").strip()
             
-            if choice == 1:  # Add new
-                success, overleaf_id, gitlab_paths = add_single_mapping(config_path, verbose)
-                if success:
-                    if not 'repos' in config:
-                        config.add_section('repos')
-                    config['repos'][overleaf_id] = gitlab_paths
-                    if write_config(config, config_path):
-                        print("\n✓ Projekt-Mapping erfolgreich gespeichert")
+            if choice == '1':  # Add new
+                added, overleaf_id, gitlab_paths = add_single_mapping(config_path, verbose)
+                if added:
+                    # ConfigParser would lowercase the key when writing
+                    projects[overleaf_id.lower()] = gitlab_paths
+                    print("\n✓ Projekt-Mapping hinzugefügt")
             
-            elif choice == 2:  # Edit existing
-                projects = get_overleaf_projects(config, verbose)
+            elif choice == '2':  # Edit existing
                 if not projects:
                     print("✗ Keine Projekt-Mappings gefunden")
                     continue
                 
+                # The listing is only shown again after an edit, not after an invalid input
+                dirty = True
                 while True:
-                    list_existing_mappings(config)
+                    if dirty:
+                        list_existing_mappings(projects)
+                        dirty = False
                     
-                    overleaf_id = input("\nWählen Sie ein Projekt zum Bearbeiten (oder 'q' zum Beenden): ").strip()
+                    overleaf_id = _ask("\nWählen Sie ein Projekt zum Bearbeiten (oder 'q' zum Beenden): ").strip()
                     if overleaf_id.lower() == 'q':
                         break
                     
@@ -228,16 +347,33 @@ def interactive_config_setup(config_path: str, verbose: bool) -> bool:
                         print(f"✗ Ungültige Overleaf-ID: {overleaf_id}")
                         continue
                     
-                    if not edit_gitlab_paths(config, config_path, overleaf_id, verbose):
+                    if not edit_gitlab_paths(projects, overleaf_id, verbose):
                         print("✗ Bearbeitung fehlgeschlagen")
+                    dirty = True
+                    
+                    # The edit may have removed the project
+                    if not projects:
+                        break
             
-            elif choice == 3:  # Exit
+            elif choice == '3':  # Exit
                 print("\nKonfigurationsverwaltung beendet")
-                return True
+                success = True
+                break
+            
+            else:
+                print("✗ Ungültige Eingabe")
             
     except KeyboardInterrupt:
         print("\n\nKonfigurationsverwaltung abgebrochen")
-        return False
     except Exception as e:
         print(f"\n✗ Unerwarteter Fehler: {str(e)}")
-        return False
+    
+    _save_history(history_file)
+    
+    # Write all changes of the session at once, also when it was aborted
+    if projects != saved:
+        if flush_projects(config_path, projects):
+            print("✓ Änderungen gespeichert")
+        else:
+            success = False
+    return success
@@ -1,45 +1,295 @@
-import configparser
+import io
+import locale
+import logging
 import os
-from typing import Dict
+import re
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, Union
 
-def read_config(file_path: str, verbose: bool) -> configparser.ConfigParser:
-    """Read and parse configuration file."""
-    config = configparser.ConfigParser()
+# ConfigParser is only needed to write configs and for files the fast parser does
+# not handle, so it is imported where it is used
+if TYPE_CHECKING:
+    import configparser
+
+logger = logging.getLogger(__name__)
+
+# Parsed configs keyed by (absolute path, mtime in ns, size) of the file
+_CONFIG_CACHE: Dict[Tuple[str, int, int], "configparser.ConfigParser"] = {}
+# Read-only configs of the fast parser, same keys
+_FAST_CONFIG_CACHE: Dict[Tuple[str, int, int], "FastConfig"] = {}
+# Project mappings (with immutable path tuples) of the cached configs, same keys
+_PROJECTS_CACHE: Dict[Tuple[str, int, int], Dict[str, Tuple[str, ...]]] = {}
+
+@lru_cache(maxsize=32)
+def _expand_path(path: str) -> str:
+    """os.path.expanduser, cached as the interactive loops expand the same path again and again."""
+    return os.path.expanduser(path)
+
+def _invalidate_config_cache(abs_path: str, keep: Optional[Tuple[str, int, int]] = None) -> None:
+    """Drop all cached configs (and their project mappings) read from a path.
+    @param keep: Key of the current state of the file, whose entries stay cached
+    """
+    for cache in (_CONFIG_CACHE, _FAST_CONFIG_CACHE, _PROJECTS_CACHE):
+        for key in [key for key in cache if key[0] == abs_path and key != keep]:
+            del cache[key]
+
+# configparser.DEFAULTSECT
+_DEFAULT_SECTION = 'DEFAULT'
+# Line patterns of the fast parser, matched against stripped lines
+_SECTION_RE = re.compile(r'\[(?P<name>.+)\]$')
+# ConfigParser splits at the first '=' or ':'
+_OPTION_RE = re.compile(r'(?P<key>[^=:]*?)\s*[=:]\s*(?P<value>.*)$')
+
+def _parse_fast(text: str) -> Optional[Dict[str, Dict[str, str]]]:
+    """Parse all sections line by line with two precompiled patterns instead of ConfigParser.
+    Only plain `key = value` lines are understood.
+    @return: The options per section, or None if the file uses features that need
+             ConfigParser (interpolation, multi-line values, DEFAULT, duplicates, ...)
+    """
+    sections: Dict[str, Dict[str, str]] = {}
+    section = None
+    for line in text.split('\n'):
+        stripped = line.strip()
+        if not stripped or stripped[0] in '#;':
+            continue
+        if line[0].isspace():
+            return None  # continuation line of a multi-line value
+        if stripped[0] == '[':
+            match = _SECTION_RE.match(stripped)
+            if not match or match['name'] == _DEFAULT_SECTION or match['name'] in sections:
+                return None
+            section = sections[match['name']] = {}
+            continue
+        
+        match = _OPTION_RE.match(stripped)
+        if section is None or not match or '%' in stripped:
+            return None
+        # ConfigParser lowercases keys
+        key = match['key'].lower()
+        if not key or key in section:
+            return None
+        section[key] = match['value']
+    return sections
+
+class FastConfig:
+    """Read-only view of a config file parsed by _parse_fast.
+    Supports the read accesses of ConfigParser used here: `in`, `[]` and items().
+    """
+    def __init__(self, sections: Dict[str, Dict[str, str]]):
+        self._sections = sections
+
+    def __contains__(self, section: str) -> bool:
+        return section in self._sections
+
+    def __getitem__(self, section: str) -> Dict[str, str]:
+        return self._sections[section]
+
+    def items(self):
+        return self._sections.items()
+
+def _new_config_parser() -> "configparser.ConfigParser":
+    """Create an empty ConfigParser, importing configparser on first use."""
+    import configparser
+    return configparser.ConfigParser()
+
+def read_config(file_path: str, verbose: bool, read_only: bool = False) -> Union["configparser.ConfigParser", FastConfig]:
+    """Read and parse configuration file.
+    Parsed files are cached until their modification time or size changes. The file
+    is read once, the same text is given to the fast parser and to ConfigParser.
+    @param read_only: Return a FastConfig where the file allows it (the result must not be modified or written)
+    """
+    return _read_config_keyed(file_path, verbose, read_only)[0]
+
+def _read_config_keyed(file_path: str, verbose: bool, read_only: bool
+                       ) -> Tuple[Union["configparser.ConfigParser", FastConfig], Optional[Tuple[str, int, int]]]:
+    """read_config, also returning the cache key of the file.
+    @return: (config, key), the key is None if the file could not be read
+    """
+    config = FastConfig({}) if read_only else _new_config_parser()
+    key = None
+    expanded_path = _expand_path(file_path)
     try:
-        expanded_path = os.path.expanduser(file_path)
-        if os.path.exists(expanded_path):
-            config.read(expanded_path)
-            if verbose:
-                print(f"✓ Konfiguration geladen: {expanded_path}")
+        abs_path = os.path.abspath(expanded_path)
+        # A single stat both checks the existence and builds the cache key
+        st = os.stat(abs_path)
+        file_key = (abs_path, st.st_mtime_ns, st.st_size)
+        
+        if read_only and file_key in _FAST_CONFIG_CACHE:
+            config = _FAST_CONFIG_CACHE[file_key]
+        elif file_key in _CONFIG_CACHE:
+            config = _CONFIG_CACHE[file_key]
         else:
-            if verbose:
-                print(f"⚠ Konfigurationsdatei nicht gefunden: {expanded_path}")
+            # Unlike ConfigParser.read, this does not silently ignore unreadable files
+            with open(abs_path, 'r') as f:
+                text = f.read()
+            sections = _parse_fast(text) if read_only else None
+            _invalidate_config_cache(abs_path, keep=file_key)
+            if sections is not None:
+                config = _FAST_CONFIG_CACHE[file_key] = FastConfig(sections)
+            else:
+                config = _new_config_parser()
+                config.read_string(text, source=abs_path)
+                _CONFIG_CACHE[file_key] = config
+        
+        key = file_key
+        logger.debug(f"✓ Konfiguration geladen: {expanded_path}")
+    except FileNotFoundError:
+        logger.debug(f"⚠ Konfigurationsdatei nicht gefunden: {expanded_path}")
     except Exception as e:
-        print(f"✗ Fehler beim Lesen der Konfiguration: {e}")
+        logger.error(f"✗ Fehler beim Lesen der Konfiguration: {e}")
     
-    return config
+    return config, key
+
+def _split_paths(gitlab_paths: str) -> Tuple[str, ...]:
+    """Split the comma-separated GitLab paths of a mapping, empty entries are dropped."""
+    return tuple(path for path in (p.strip() for p in gitlab_paths.split(',')) if path)
+
+def _join_paths(gitlab_paths: List[str]) -> str:
+    """Join GitLab paths to the comma-separated value of a mapping."""
+    return ', '.join(gitlab_paths)
 
-def get_overleaf_projects(config: configparser.ConfigParser, verbose: bool) -> Dict[str, str]:
-    """Extract Overleaf project mappings from config."""
+def get_overleaf_projects(config: Union["configparser.ConfigParser", FastConfig, str], verbose: bool) -> Dict[str, List[str]]:
+    """Extract Overleaf project mappings from config.
+    The GitLab paths are split once here, callers get a list per project which they may modify.
+    Given a file path instead of a parsed config, the file is read with read_config(read_only=True)
+    and the split mappings are cached under the same key as the parsed file.
+    """
+    key = None
+    if isinstance(config, str):
+        config, key = _read_config_keyed(config, verbose, read_only=True)
+    
     projects = {}
     if 'repos' in config:
-        projects = dict(config['repos'])
-        if verbose:
-            print(f"✓ {len(projects)} Projekte in Konfiguration gefunden")
+        cached_projects = _PROJECTS_CACHE.get(key) if key else None
+        if cached_projects is None:
+            cached_projects = {overleaf_id: _split_paths(paths) for overleaf_id, paths in config['repos'].items()}
+            if key:
+                _PROJECTS_CACHE[key] = cached_projects
+        projects = {overleaf_id: list(paths) for overleaf_id, paths in cached_projects.items()}
+        logger.debug(f"✓ {len(projects)} Projekte in Konfiguration gefunden")
     return projects
 
-def write_config(config: configparser.ConfigParser, config_path: str) -> bool:
-    """Write configuration to file safely."""
+def _atomic_write(path: str, text: str) -> os.stat_result:
+    """Write a config file to a temporary file next to path and move it into place,
+    so an interrupted write never leaves a truncated config behind.
+    The content is written with a single write() and fsync, a new config is only
+    readable by the user. Missing directories are created.
+    @return: The stat of the written file
+    """
+    # Replace the file a symlink points to, not the symlink itself
+    path = os.path.realpath(path)
+    tmp_path = path + '.tmp'
+    # Same encoding as used for reading the config
+    data = memoryview(text.encode(locale.getpreferredencoding(False)))
+    
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
     try:
-        expanded_path = os.path.expanduser(config_path)
-        config_dir = os.path.dirname(expanded_path)
-        
-        if config_dir:
-            os.makedirs(config_dir, exist_ok=True)
-            
-        with open(expanded_path, 'w') as f:
-            config.write(f)
-        return True
+        try:
+            fd = os.open(tmp_path, flags, 0o600)
+        except FileNotFoundError:
+            # Only create the directory when it is actually missing
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd = os.open(tmp_path, flags, 0o600)
+        try:
+            while data:
+                data = data[os.write(fd, data):]
+            os.fsync(fd)
+            try:
+                os.chmod(tmp_path, os.stat(path).st_mode & 0o7777)
+            except FileNotFoundError:
+                pass
+            # Neither chmod nor the rename change mtime or size, this is the stat of the result
+            st = os.fstat(fd)
+        finally:
+            os.close(fd)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    
+    # Persist the rename itself (not possible on every platform)
+    try:
+        dir_fd = os.open(os.path.dirname(path), os.O_RDONLY)
+    except OSError:
+        return st
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+    return st
+
+def _store_config(config_path: str, text: str, config: Union["configparser.ConfigParser", FastConfig]) -> bool:
+    """Write the rendered config and cache config as parsed content of the new file,
+    so reading it again is a lookup.
+    """
+    expanded_path = _expand_path(config_path)
+    abs_path = os.path.abspath(expanded_path)
+    # The config may have been modified in place, drop it and everything read from the old file
+    _invalidate_config_cache(abs_path)
+    try:
+        st = _atomic_write(expanded_path, text)
+    except Exception as e:
+        logger.error(f"✗ Fehler beim Schreiben der Konfiguration: {e}")
+        return False
+    
+    cache = _FAST_CONFIG_CACHE if isinstance(config, FastConfig) else _CONFIG_CACHE
+    cache[(abs_path, st.st_mtime_ns, st.st_size)] = config
+    return True
+
+def _serialize_fast(sections: Dict[str, Dict[str, str]]) -> Optional[str]:
+    """Render sections exactly like ConfigParser.write, without ConfigParser.
+    @return: The file content, or None if an option would not be read back unchanged
+             by _parse_fast (then ConfigParser has to write it)
+    """
+    lines = []
+    for name, options in sections.items():
+        lines.append(f"[{name}]")
+        for key, value in options.items():
+            line = f"{key} = {value}"
+            match = _OPTION_RE.match(line)
+            if (not match or match['key'] != key or match['value'] != value
+                    or '%' in line or '\n' in line or key != key.lower()):
+                return None
+            lines.append(line)
+        lines.append("")
+    return "".join(line + "\n" for line in lines)
+
+def write_config(config: "configparser.ConfigParser", config_path: str) -> bool:
+    """Write configuration to file safely.
+    The written config is cached for the new state of the file, so reading it again is a lookup.
+    """
+    try:
+        buffer = io.StringIO()
+        config.write(buffer)
     except Exception as e:
-        print(f"✗ Fehler beim Schreiben der Konfiguration: {e}")
+        logger.error(f"✗ Fehler beim Schreiben der Konfiguration: {e}")
+        return False
+    return _store_config(config_path, buffer.getvalue(), config)
+
+def flush_projects(config_path: str, projects: Dict[str, List[str]]) -> bool:
+    """Write the project mappings as [repos] section in one pass, other sections of the file are kept.
+    Files the fast parser understands are written without ConfigParser.
+    @return: Success status
+    """
+    repos = {overleaf_id: _join_paths(paths) for overleaf_id, paths in projects.items()}
+    config = read_config(config_path, False, read_only=True)
+    if isinstance(config, FastConfig):
+        sections = dict(config.items())
+        sections['repos'] = repos
+        text = _serialize_fast(sections)
+        if text is not None:
+            return _store_config(config_path, text, FastConfig(sections))
+    
+    config = read_config(config_path, False)
+    try:
+        config['repos'] = repos
+    except ValueError as e:  # e.g. a '%' that is no valid interpolation
+        _invalidate_config_cache(os.path.abspath(_expand_path(config_path)))
+        logger.error(f"✗ Fehler beim Schreiben der Konfiguration: {e}")
         return False
+    return write_config(config, config_path)
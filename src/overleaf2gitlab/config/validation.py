@@ -1,23 +1,37 @@
-from .operations import read_config, get_overleaf_projects
+import os
+import re
+from .operations import get_overleaf_projects, read_config
 
-def validate_config(config_path: str, verbose: bool) -> tuple[bool, str]:
-    """Validate configuration file and contents."""
-    config = read_config(config_path, verbose)
-    
-    if 'repos' not in config:
-        return False, "Keine [repos] Sektion in Konfigurationsdatei gefunden"
-    
-    projects = get_overleaf_projects(config, verbose)
+# Overleaf project IDs are 24 hex digits (ConfigParser lowercases them)
+_OVERLEAF_ID_RE = re.compile(r'[0-9a-f]{24}')
+
+def is_valid_overleaf_id(overleaf_id: str) -> bool:
+    """Check if overleaf_id has the format of an Overleaf project ID (case-insensitive)."""
+    return _OVERLEAF_ID_RE.fullmatch(overleaf_id.lower()) is not None
+
+def validate_config(config_path: str, verbose: bool) -> tuple[bool, str, dict[str, list[str]]]:
+    """Validate configuration file and contents in a single pass over the mappings.
+    The mappings are read through the cache of get_overleaf_projects, the file is only
+    looked at again to explain why there are none.
+    @return: (is_valid, message, projects), the project mappings are only given for a valid config
+    """
+    projects = get_overleaf_projects(config_path, verbose)
     
     if not projects:
-        return False, "Keine Projekt-Mappings in [repos] Sektion gefunden"
+        if not os.path.exists(os.path.expanduser(config_path)):
+            return False, f"Konfigurationsdatei nicht gefunden: {config_path}", {}
+        if 'repos' not in read_config(config_path, verbose, read_only=True):
+            return False, "Keine [repos] Sektion in Konfigurationsdatei gefunden", {}
+        return False, "Keine Projekt-Mappings in [repos] Sektion gefunden", {}
     
-    # Validate format of mappings
+    # Validate format of mappings, the messages are only built for the first invalid one
     for overleaf_id, gitlab_paths in projects.items():
-        if not overleaf_id.strip():
-            return False, "Leere Overleaf-ID gefunden"
+        if not is_valid_overleaf_id(overleaf_id):
+            if not overleaf_id.strip():
+                return False, "Leere Overleaf-ID gefunden", {}
+            return False, f"Ungültige Overleaf-ID: {overleaf_id}", {}
         
-        if not gitlab_paths.strip():
-            return False, f"Leere GitLab-Pfade für Projekt {overleaf_id}"
+        if not gitlab_paths:
+            return False, f"Leere GitLab-Pfade für Projekt {overleaf_id}", {}
     
-    return True, f"Konfiguration ist gültig ({len(projects)} Projekte)"
+    return True, f"Konfiguration ist gültig ({len(projects)} Projekte)", projects
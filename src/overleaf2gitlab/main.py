@@ -1,8 +1,14 @@
+# Only the argument parser is imported up front: the config and backup
+# packages are imported where needed, so --help and error paths stay fast
 from .parser import get_args, check_global_arguments
-from .config import read_config, get_overleaf_projects, validate_config, interactive_config_setup
-from .backup import backup_overleaf_project
-from configparser import ConfigParser
+from logging.handlers import MemoryHandler
+from typing import Optional
+import logging
 import os
+import sys
+import threading
+
+logger = logging.getLogger(__name__)
 
 
 def handle_init_command(config_path: str, verbose: bool) -> bool:
@@ -12,22 +18,25 @@ def handle_init_command(config_path: str, verbose: bool) -> bool:
     @param verbose: Whether to print verbose output
     @return: Success status
     """
+    from .config import validate_config, interactive_config_setup
+    
     print("=== Overleaf2GitLab Konfigurationsverwaltung ===\n")
     
-    # Always show config path
+    # Always show config path, the expanded path is used from here on
     expanded_path = os.path.expanduser(config_path)
     print(f"Konfigurationsdatei: {expanded_path}")
 
     # Validate existing config
-    is_valid, message = validate_config(config_path, verbose)
+    is_valid, message, _ = validate_config(expanded_path, verbose)
     
     if verbose:
         print(f"Konfigurationsstatus: {message}")
     
     # Start interactive configuration
-    return interactive_config_setup(config_path, verbose)
+    return interactive_config_setup(expanded_path, verbose)
 
-def backup_single_project(overleaf_id: str, available_projects: dict[str, str], cache_dir: str, clean: bool, verbose: bool) -> bool:
+def backup_single_project(overleaf_id: str, available_projects: dict[str, list[str]], cache_dir: str, clean: bool, verbose: bool,
+                          shallow: bool = False) -> bool:
     """
     Handle the backup of a single Overleaf project.
     @param overleaf_id: The Overleaf project ID to back up
@@ -35,42 +44,137 @@ def backup_single_project(overleaf_id: str, available_projects: dict[str, str],
     @param cache_dir: The directory to use for caching
     @param clean: Whether to clean the cache before backing up
     @param verbose: Whether to enable verbose output
+    @param shallow: Whether to only fetch the latest Overleaf commit
     @return: Success status
     """
+    from .backup import backup_overleaf_project
+    
     # check if overleaf id is a key in available_projects
     if overleaf_id not in available_projects:
-        print(f"✗ Overleaf-Projekt {overleaf_id} nicht in Konfiguration gefunden")
-        print("Verfügbare Projekte:")
+        logger.error(f"✗ Overleaf-Projekt {overleaf_id} nicht in Konfiguration gefunden")
+        logger.info("Verfügbare Projekte:")
         for proj_id in available_projects.keys():
-            print(f"  - {proj_id}")
+            logger.info(f"  - {proj_id}")
         return False
     
-    gitlab_paths = available_projects[overleaf_id].split(',')
-    gitlab_paths = [path.strip() for path in gitlab_paths]
+    return backup_overleaf_project(overleaf_id, available_projects[overleaf_id], cache_dir, clean, verbose, shallow)
+
+class _BufferedStdoutHandler(MemoryHandler):
+    """
+    Log handler that collects records and writes them to stdout in a single write.
+    A thread collecting the output of a project gets its own buffer and only hands
+    its records over with pop_buffer(), so concurrent projects never interleave.
+    """
+    def __init__(self, capacity: int):
+        self._local = threading.local()
+        super().__init__(capacity, flushLevel=logging.ERROR, target=logging.StreamHandler(sys.stdout))
+
+    def _collecting(self) -> bool:
+        return getattr(self._local, "buffer", None) is not None
+
+    @property
+    def buffer(self) -> list[logging.LogRecord]:
+        return self._local.buffer if self._collecting() else self._shared_buffer
+
+    @buffer.setter
+    def buffer(self, records: list[logging.LogRecord]) -> None:
+        if self._collecting():
+            self._local.buffer = records
+        else:
+            self._shared_buffer = records
+
+    def start_buffer(self) -> None:
+        self._local.buffer = []
+
+    def pop_buffer(self) -> list[logging.LogRecord]:
+        records = self._local.buffer
+        self._local.buffer = None
+        return records
+
+    def shouldFlush(self, record: logging.LogRecord) -> bool:
+        return not self._collecting() and super().shouldFlush(record)
+
+    def flush(self) -> None:
+        if self._collecting():
+            return
+        self.acquire()
+        try:
+            if self.buffer and self.target:
+                stream = self.target.stream
+                stream.write("".join(self.format(record) + "\n" for record in self.buffer))
+                stream.flush()
+                self.buffer = []
+        finally:
+            self.release()
+
+def setup_logging(verbose: bool, buffered: bool = True) -> None:
+    """
+    Configure the output of all modules: messages only, debug messages with verbose.
+    @param verbose: Whether to enable verbose output
+    @param buffered: Whether to batch the output (disable for interactive use)
+    """
+    logging.basicConfig(level=logging.DEBUG if verbose else logging.INFO, format="%(message)s",
+                        handlers=[_BufferedStdoutHandler(100 if buffered else 1)])
+
+def _backup_project_buffered(handler: Optional[_BufferedStdoutHandler], overleaf_id: str, gitlab_paths: list[str], cache_dir: str, clean: bool, verbose: bool,
+                             shallow: bool) -> tuple[bool, list[logging.LogRecord]]:
+    """
+    Run the backup of one project while collecting its log records.
+    @return: (success, collected log records)
+    """
+    from .backup import backup_overleaf_project
+    
+    if handler is None:
+        return backup_overleaf_project(overleaf_id, gitlab_paths, cache_dir, clean, verbose, shallow), []
     
-    return backup_overleaf_project(overleaf_id, gitlab_paths, cache_dir, clean, verbose)
+    handler.start_buffer()
+    try:
+        success = backup_overleaf_project(overleaf_id, gitlab_paths, cache_dir, clean, verbose, shallow)
+    finally:
+        records = handler.pop_buffer()
+    return success, records
 
-def backup_all_projects(available_projects: dict[str, str], cache_dir: str, clean: bool, verbose: bool) -> bool:
+def backup_all_projects(available_projects: dict[str, list[str]], cache_dir: str, clean: bool, verbose: bool, jobs: Optional[int] = None,
+                        shallow: bool = False) -> bool:
     """
     Handle the backup of all Overleaf projects.
+    Projects are backed up concurrently, their output is printed per project once it finished.
     @param available_projects: A dictionary of available projects
     @param cache_dir: The directory to use for caching
     @param clean: Whether to clean the cache before backing up
     @param verbose: Whether to enable verbose output
+    @param jobs: Number of projects to back up in parallel (default: up to 8)
+    @param shallow: Whether to only fetch the latest Overleaf commit
     @return: Success status
     """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    
     success_count = 0
     total_count = len(available_projects)
-    
-    for overleaf_id, gitlab_paths_str in available_projects.items():
-        gitlab_paths = [path.strip() for path in gitlab_paths_str.split(',')]
+    max_workers = jobs or min(8, total_count)
+    
+    handler = next((h for h in logging.getLogger().handlers if isinstance(h, _BufferedStdoutHandler)), None)
+    # Write what is pending before the workers start, the project blocks follow it
+    if handler is not None:
+        handler.flush()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for overleaf_id, gitlab_paths in available_projects.items():
+            future = executor.submit(_backup_project_buffered, handler, overleaf_id, gitlab_paths, cache_dir, clean, verbose, shallow)
+            futures[future] = overleaf_id
         
-        if backup_overleaf_project(overleaf_id, gitlab_paths, cache_dir, clean, verbose):
-            success_count += 1
-        else:
-            print(f"✗ Backup für Projekt {overleaf_id} fehlgeschlagen")
-    
-    print(f"\nBackup abgeschlossen: {success_count}/{total_count} Projekte erfolgreich")
+        for future in as_completed(futures):
+            overleaf_id = futures[future]
+            success, records = future.result()
+            for record in records:
+                handler.handle(record)
+            
+            if success:
+                success_count += 1
+            else:
+                logger.error(f"✗ Backup für Projekt {overleaf_id} fehlgeschlagen")
+    
+    logger.info(f"\nBackup abgeschlossen: {success_count}/{total_count} Projekte erfolgreich")
     return success_count == total_count
 
 def main() -> None:
@@ -78,45 +182,41 @@ def main() -> None:
     Main entry point for the Overleaf2GitLab CLI.
     """
     args = get_args()
+    # The config command is interactive, its messages must not wait in a buffer
+    setup_logging(args.verbose, buffered=args.command != "config")
     
     # Handle config command separately
     if args.command == "config":
         success = handle_init_command(args.config, args.verbose)
         exit(0 if success else 1)
     
-    # For backup commands, validate config first
-    is_valid, message = validate_config(args.config, args.verbose)
+    from .config import validate_config
+    
+    # For backup commands, validate config first, this also loads the project mappings
+    is_valid, message, available_projects = validate_config(args.config, args.verbose)
     
     if not is_valid:
-        print(f"✗ {message}")
-        print(f"Führen Sie 'overleaf2gitlab config' aus, um die Konfiguration zu erstellen.")
+        logger.error(f"✗ {message}")
+        logger.info(f"Führen Sie 'overleaf2gitlab config' aus, um die Konfiguration zu erstellen.")
         exit(1)
     
     # Load configuration
     success, config_path, cache_dir, clean, verbose = check_global_arguments(args)
     if not success:
-        print("✗ Ungültige Argumente")
-        exit(1)
-    
-    config = read_config(config_path, verbose)
-    available_projects = get_overleaf_projects(config, verbose)
-    
-    if not available_projects:
-        print("✗ Keine Projekte in Konfiguration gefunden")
-        print("Führen Sie 'overleaf2gitlab config' aus, um Projekte zu konfigurieren.")
+        logger.error("✗ Ungültige Argumente")
         exit(1)
     
     # Handle backup commands
     if args.command == "backup-single":
-        success = backup_single_project(args.overleaf_id, available_projects, cache_dir, clean, verbose)
+        success = backup_single_project(args.overleaf_id, available_projects, cache_dir, clean, verbose, args.shallow)
         exit(0 if success else 1)
     
     elif args.command == "backup-all":
-        success = backup_all_projects(available_projects, cache_dir, clean, verbose)
+        success = backup_all_projects(available_projects, cache_dir, clean, verbose, args.jobs, args.shallow)
         exit(0 if success else 1)
     
     else:
-        print("✗ Unbekannter Befehl. Verwenden Sie --help für verfügbare Befehle.")
+        logger.error("✗ Unbekannter Befehl. Verwenden Sie --help für verfügbare Befehle.")
         exit(1)
 
 if __name__ == "__main__":
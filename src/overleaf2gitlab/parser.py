@@ -1,6 +1,9 @@
 from argparse import ArgumentParser, Namespace
-from os.path import exists, expanduser
-from os import makedirs
+import logging
+from os.path import expanduser
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
 
 def get_args() -> Namespace:
     "Argument parser for Overleaf to GitLab backup tool"
@@ -23,6 +26,11 @@ def get_args() -> Namespace:
                         action="store_true",
                         help="Clean cache after backup")
 
+    parser.add_argument("--shallow",
+                        action="store_true",
+                        help="Create new cache repositories as shallow clone (--depth=1) of the latest Overleaf commit; "
+                             "the backup remotes must already contain the history or accept shallow pushes")
+
     # Subcommands
     subparsers = parser.add_subparsers(dest="command", help="Available commands")
     
@@ -35,6 +43,10 @@ def get_args() -> Namespace:
     
     # Backup all command
     all_parser = subparsers.add_parser("backup-all", help="Backup all configured projects")
+    all_parser.add_argument("--jobs",
+                            type=int,
+                            default=None,
+                            help="Number of projects to back up in parallel (default: up to 8)")
     
     return parser.parse_args()
 
@@ -46,12 +58,18 @@ def check_global_arguments(args: Namespace) -> tuple[bool, str, str, bool, bool]
     @return: (is_valid, config_path, cache_dir_path, clean_cache, verbose)
     """
     # Check and print global arguments
-    if args.verbose:
-        print("Verbose mode is enabled")
-        print(f"Using cache directory: {args.cache_dir}")
-        print(f"Using configuration file: {args.config}")
-        print(f"Clean cache backup: {args.clean}")
-        print(f"Command: {args.command}")
+    logger.debug("Verbose mode is enabled")
+    logger.debug(f"Using cache directory: {args.cache_dir}")
+    logger.debug(f"Using configuration file: {args.config}")
+    logger.debug(f"Clean cache backup: {args.clean}")
+    logger.debug(f"Shallow fetch: {args.shallow}")
+    logger.debug(f"Command: {args.command}")
+
+    # Check number of parallel jobs for backup-all
+    jobs = getattr(args, "jobs", None)
+    if jobs is not None and jobs < 1:
+        logger.error(f"Invalid number of jobs: {jobs}")
+        return False, "", "", args.clean, args.verbose
 
     # Expandiere ~ zu Home-Verzeichnis
     config_path = expanduser(args.config)
@@ -61,10 +79,11 @@ def check_global_arguments(args: Namespace) -> tuple[bool, str, str, bool, bool]
     # if not exists(config_path):
     #     raise FileNotFoundError(f"Configuration file '{config_path}' does not exist. please use `--config` to specify a valid config file.")
     
-    # Create cache directory if it does not exist
-    if not exists(cache_dir_path):
-        makedirs(cache_dir_path)
-        if args.verbose:
-            print(f"Created cache directory: {cache_dir_path}")
+    # Create cache directory if it does not exist (a single mkdir, no separate exists check)
+    try:
+        Path(cache_dir_path).mkdir(parents=True)
+        logger.debug(f"Created cache directory: {cache_dir_path}")
+    except FileExistsError:
+        pass
     
     return True, config_path, cache_dir_path, args.clean, args.verbose
\ No newline at end of file